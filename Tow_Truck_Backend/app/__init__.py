@@ -1,11 +1,12 @@
 from flask import Flask, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+import click
 import os
 
 db = SQLAlchemy()
 
-def create_app():
+def create_app(profile_sql=None):
     app = Flask(__name__)
     
     # Configuration
@@ -16,6 +17,19 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url.replace('postgresql://', 'postgresql+psycopg://')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SECRET_KEY'] = 'your-secret-key-change-this'
+    # Completed service requests older than this are moved to the archive table
+    app.config['ARCHIVE_AFTER_DAYS'] = int(os.environ.get('ARCHIVE_AFTER_DAYS', 180))
+    app.config['ARCHIVE_BATCH_SIZE'] = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+    # How long Idempotency-Key responses are replayed, and how many are kept in memory
+    app.config['IDEMPOTENCY_TTL_HOURS'] = int(os.environ.get('IDEMPOTENCY_TTL_HOURS', 24))
+    app.config['IDEMPOTENCY_CACHE_SIZE'] = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', 1024))
+    # How many drivers' queue responses are kept in memory
+    app.config['DRIVER_QUEUE_CACHE_SIZE'] = int(os.environ.get('DRIVER_QUEUE_CACHE_SIZE', 256))
+    # Per-request SQL profiling (development/CI only), see app/profiling.py
+    if profile_sql is None:
+        profile_sql = os.environ.get('SQL_PROFILING', '').lower() in ('1', 'true', 'yes')
+    app.config['SQL_PROFILE_REPORT'] = os.environ.get('SQL_PROFILE_REPORT', 'sql_profile.json')
+    app.config['SQL_N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 5))
     
     # Initialize extensions
     db.init_app(app)
@@ -24,7 +38,7 @@ def create_app():
     CORS(app, 
          origins="*",
          methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-         allow_headers=["Content-Type", "Authorization"],
+         allow_headers=["Content-Type", "Authorization", "Idempotency-Key"],
          supports_credentials=False)
     
     # Database reset endpoint (for development only)
@@ -38,14 +52,57 @@ def create_app():
         return jsonify({'message': 'Database reset complete'}), 200
     
     # Register blueprints
-    from app.routes import auth, clients, employees, service_requests
+    from app.routes import auth, bootstrap, clients, drivers, employees, service_requests
     app.register_blueprint(auth.bp)
+    app.register_blueprint(bootstrap.bp)
     app.register_blueprint(clients.bp)
+    app.register_blueprint(drivers.bp)
     app.register_blueprint(employees.bp)
     app.register_blueprint(service_requests.bp)
     
+    # Archive mover job, e.g. `flask --app app:create_app archive-requests` from a cron
+    @app.cli.command('archive-requests')
+    def archive_requests_command():
+        from app.archive import archive_completed_requests
+        result = archive_completed_requests(
+            older_than_days=app.config['ARCHIVE_AFTER_DAYS'],
+            batch_size=app.config['ARCHIVE_BATCH_SIZE']
+        )
+        print(f"[ARCHIVE] Moved {result['moved']} service requests completed before {result['cutoff']}")
+        print(f"[ARCHIVE] Before: {result['before']}")
+        print(f"[ARCHIVE] After: {result['after']}")
+    
+    # Duplicate client merge job, e.g. `flask --app app:create_app dedupe-clients --dry-run`
+    @app.cli.command('dedupe-clients')
+    @click.option('--dry-run', is_flag=True, help='Only report the duplicates that would be merged')
+    def dedupe_clients_command(dry_run):
+        from app.dedupe import merge_duplicate_clients
+        result = merge_duplicate_clients(dry_run=dry_run)
+        for merge in result['merges']:
+            print(f"[DEDUPE] Keep {merge['keep']}, remove {', '.join(merge['removed'])}")
+        for candidate in result['candidates']:
+            print(f"[DEDUPE] Review {' / '.join(candidate['clients'])} ({' / '.join(candidate['names'])}), not merged")
+        print(f"[DEDUPE] {result['groups']} duplicate groups, {result['removed']} clients removed, "
+              f"{result['requestsRepointed']} service requests re-pointed{' (dry run)' if dry_run else ''}")
+    
+    @app.cli.command('purge-idempotency-keys')
+    def purge_idempotency_keys_command():
+        from app.idempotency import purge_expired_idempotency_keys
+        print(f"[IDEMPOTENCY] Purged {purge_expired_idempotency_keys()} expired keys")
+    
     # Create database tables
     with app.app_context():
         db.create_all()
+        from app.dedupe import ensure_client_normalized_columns
+        ensure_client_normalized_columns()
+        from app.archive import backfill_completion_dates
+        backfill_completion_dates()
+        # create_all skips tables that already exist, so add any indexes they are missing
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+        if profile_sql:
+            from app.profiling import SQLProfiler
+            SQLProfiler(app, db.engine)
     
     return app
@@ -0,0 +1,147 @@
+"""Move old completed service requests out of the hot service_requests table.
+
+The mover works in small batches, each committed in its own transaction, so
+locks on service_requests are only held for one batch at a time and an
+interrupted run simply picks up where it stopped the next time it runs.
+"""
+from app import db
+from app.models import ServiceRequest, ArchivedServiceRequest
+from datetime import datetime, timedelta
+from sqlalchemy import text
+
+ARCHIVED_STATUS = 'Completed'
+
+def _is_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1)
+
+def _next_month(value):
+    if value.month == 12:
+        return datetime(value.year + 1, 1, 1)
+    return datetime(value.year, value.month + 1, 1)
+
+def ensure_archive_partition(completion_date):
+    """Create the monthly archive partition holding completion_date (Postgres only)"""
+    if not _is_postgres():
+        return
+    start = _month_start(completion_date)
+    end = _next_month(start)
+    partition_name = f"{ArchivedServiceRequest.__tablename__}_{start:%Y_%m}"
+    db.session.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name} "
+        f"PARTITION OF {ArchivedServiceRequest.__tablename__} "
+        f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+    ))
+
+def backfill_completion_dates():
+    """Give Completed requests saved without a completion_date their last update time.
+
+    Older code only stored the date when the client sent one, so such rows
+    would never be archived. Returns the number of rows fixed.
+    """
+    fixed = ServiceRequest.query.filter(
+        ServiceRequest.status == ARCHIVED_STATUS,
+        ServiceRequest.completion_date.is_(None)
+    ).update({
+        'completion_date': db.func.coalesce(ServiceRequest.last_updated_at, ServiceRequest.requested_date),
+        # Keep the audit timestamp instead of letting onupdate bump it
+        'last_updated_at': ServiceRequest.last_updated_at
+    }, synchronize_session=False)
+    db.session.commit()
+    if fixed:
+        print(f"[ARCHIVE] Backfilled completion_date for {fixed} completed service requests")
+    return fixed
+
+def archive_cutoff(older_than_days):
+    return datetime.utcnow() - timedelta(days=older_than_days)
+
+def _archive_batch(cutoff, batch_size, lock_timeout_ms):
+    """Copy one batch into the archive and delete it from the hot table.
+
+    Returns the number of rows moved.
+    """
+    if _is_postgres():
+        # Give up quickly instead of queueing behind a long-running edit
+        db.session.execute(text(f"SET LOCAL lock_timeout = '{int(lock_timeout_ms)}ms'"))
+
+    # SKIP LOCKED leaves rows someone is editing right now for a later run
+    batch = ServiceRequest.query.filter(
+        ServiceRequest.status == ARCHIVED_STATUS,
+        ServiceRequest.completion_date.isnot(None),
+        ServiceRequest.completion_date < cutoff
+    ).order_by(ServiceRequest.id).limit(batch_size).with_for_update(skip_locked=True).all()
+
+    if not batch:
+        return 0
+
+    for month in {_month_start(sr.completion_date) for sr in batch}:
+        ensure_archive_partition(month)
+
+    columns = [column.key for column in ServiceRequest.__table__.columns]
+    for sr in batch:
+        db.session.add(ArchivedServiceRequest(**{key: getattr(sr, key) for key in columns}))
+    db.session.flush()
+
+    ServiceRequest.query.filter(
+        ServiceRequest.id.in_([sr.id for sr in batch])
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return len(batch)
+
+def archive_completed_requests(older_than_days, batch_size=500, max_batches=None, lock_timeout_ms=2000):
+    """Move completed service requests older than older_than_days into the archive.
+
+    Safe to re-run at any time: every batch is its own transaction.
+    """
+    cutoff = archive_cutoff(older_than_days)
+    before = archive_table_stats()
+    moved = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        try:
+            count = _archive_batch(cutoff, batch_size, lock_timeout_ms)
+        except Exception:
+            db.session.rollback()
+            raise
+        if count == 0:
+            break
+        moved += count
+        batches += 1
+        print(f"[ARCHIVE] Batch {batches}: moved {count} service requests (total {moved})")
+
+    return {
+        'cutoff': cutoff.isoformat(),
+        'moved': moved,
+        'batches': batches,
+        'before': before,
+        'after': archive_table_stats()
+    }
+
+def _table_bytes(table_name, partitioned=False):
+    if not _is_postgres():
+        return None
+    if partitioned:
+        # The parent of a partitioned table has no storage of its own
+        query = text(
+            "SELECT COALESCE(SUM(pg_total_relation_size(inhrelid)), 0) "
+            "FROM pg_inherits WHERE inhparent = to_regclass(:name)"
+        )
+    else:
+        query = text("SELECT COALESCE(pg_total_relation_size(to_regclass(:name)), 0)")
+    return int(db.session.execute(query, {'name': table_name}).scalar())
+
+def archive_table_stats():
+    """Row counts and on-disk sizes (Postgres only) of the hot and archive tables"""
+    return {
+        'serviceRequests': {
+            'rows': ServiceRequest.query.count(),
+            'bytes': _table_bytes(ServiceRequest.__tablename__)
+        },
+        'archivedServiceRequests': {
+            'rows': ArchivedServiceRequest.query.count(),
+            'bytes': _table_bytes(ArchivedServiceRequest.__tablename__, partitioned=True)
+        }
+    }
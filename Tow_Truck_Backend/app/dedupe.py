@@ -0,0 +1,190 @@
+"""Duplicate client detection and merging.
+
+Profiles are compared on their normalized phone and name columns. The batch
+merge only compares profiles that share a normalized phone number (the
+blocking key), so the work grows with the size of each block rather than
+with the square of the whole client table. Only identical names are merged;
+similar ones are reported for review.
+"""
+from app import db
+from app.models import ClientProfile, ServiceRequest, ArchivedServiceRequest, client_id_counter, normalize_phone, normalize_name
+from difflib import SequenceMatcher
+from itertools import groupby
+from sqlalchemy import func, inspect, text
+
+NAME_SIMILARITY_THRESHOLD = 0.88
+BACKFILL_BATCH_SIZE = 500
+
+def ensure_client_normalized_columns():
+    """Add and backfill the normalized client columns on databases created before they existed.
+
+    Their indexes are created afterwards by create_app along with any other missing ones.
+    """
+    table = ClientProfile.__table__
+    existing = {column['name'] for column in inspect(db.engine).get_columns(table.name)}
+    for column in (table.c.customer_phone_normalized, table.c.customer_name_normalized):
+        if column.name not in existing:
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            print(f"[DEDUPE] Added column {table.name}.{column.name}")
+    db.session.commit()
+
+    backfilled = 0
+    while True:
+        batch = db.session.query(
+            ClientProfile.id,
+            ClientProfile.customer_first_name,
+            ClientProfile.customer_last_name,
+            ClientProfile.customer_phone
+        ).filter(
+            ClientProfile.customer_name_normalized.is_(None)
+        ).limit(BACKFILL_BATCH_SIZE).all()
+        if not batch:
+            break
+        for row in batch:
+            ClientProfile.query.filter_by(id=row.id).update({
+                'customer_phone_normalized': normalize_phone(row.customer_phone),
+                'customer_name_normalized': normalize_name(row.customer_first_name, row.customer_last_name),
+                # Keep the audit timestamp instead of letting onupdate bump it
+                'last_edited_at': ClientProfile.last_edited_at
+            }, synchronize_session=False)
+        db.session.commit()
+        backfilled += len(batch)
+    if backfilled:
+        print(f"[DEDUPE] Backfilled normalized columns for {backfilled} clients")
+
+def find_duplicate_clients(first_name, last_name, phone, limit=5):
+    """Return (exact, possible) matches for a would-be client.
+
+    Exact matches share both normalized phone and name; possible matches
+    share one of the two.
+    """
+    phone_key = normalize_phone(phone)
+    name_key = normalize_name(first_name, last_name)
+
+    exact = []
+    if phone_key and name_key:
+        exact = ClientProfile.query.filter(
+            ClientProfile.customer_phone_normalized == phone_key,
+            ClientProfile.customer_name_normalized == name_key
+        ).order_by(ClientProfile.id).limit(limit).all()
+
+    conditions = []
+    if phone_key:
+        conditions.append(ClientProfile.customer_phone_normalized == phone_key)
+    if name_key:
+        conditions.append(ClientProfile.customer_name_normalized == name_key)
+    if not conditions:
+        return exact, []
+
+    possible = ClientProfile.query.filter(
+        db.or_(*conditions),
+        ClientProfile.id.notin_([c.id for c in exact])
+    ).order_by(ClientProfile.id).limit(limit).all()
+    return exact, possible
+
+def _names_match(a, b):
+    if not a or not b:
+        return False
+    if a == b:
+        return True
+    # "jose rivera" vs "jose luis rivera"
+    tokens_a, tokens_b = set(a.split()), set(b.split())
+    if tokens_a <= tokens_b or tokens_b <= tokens_a:
+        return True
+    return SequenceMatcher(None, a, b).ratio() >= NAME_SIMILARITY_THRESHOLD
+
+def _split_block(members):
+    """Split one phone block into exact-name groups to merge and fuzzy pairs to review.
+
+    Only identical normalized names are merged automatically; near matches
+    ("maria rivera" / "mario rivera", "jose rivera" / "jose rivera jr") are
+    often relatives sharing a household phone, so they are only reported.
+    """
+    by_name = {}
+    for m in members:
+        if m.customer_name_normalized:
+            by_name.setdefault(m.customer_name_normalized, []).append(m.id)
+
+    groups = [ids for ids in by_name.values() if len(ids) > 1]
+    names = sorted(by_name)
+    candidates = []
+    for i, a in enumerate(names):
+        for b in names[i + 1:]:
+            if _names_match(a, b):
+                candidates.append((min(by_name[a]), min(by_name[b])))
+    return groups, candidates
+
+def _merge_group(ids):
+    """Keep the oldest profile, point all service requests at it and delete the rest"""
+    keep_id = min(ids)
+    duplicate_ids = [i for i in ids if i != keep_id]
+    repointed = 0
+    for model in (ServiceRequest, ArchivedServiceRequest):
+        repointed += model.query.filter(model.client_id.in_(duplicate_ids)).update(
+            {'client_id': keep_id}, synchronize_session=False
+        )
+    ClientProfile.query.filter(ClientProfile.id.in_(duplicate_ids)).delete(synchronize_session=False)
+    return keep_id, duplicate_ids, repointed
+
+def merge_duplicate_clients(dry_run=False):
+    """Merge clients sharing a phone and an identical normalized name unless dry_run.
+
+    Similar but not identical names are returned as candidates and never merged.
+    """
+    shared_phones = db.session.query(ClientProfile.customer_phone_normalized).filter(
+        ClientProfile.customer_phone_normalized.isnot(None)
+    ).group_by(ClientProfile.customer_phone_normalized).having(func.count(ClientProfile.id) > 1)
+
+    rows = db.session.query(
+        ClientProfile.id,
+        ClientProfile.client_id_number,
+        ClientProfile.customer_phone_normalized,
+        ClientProfile.customer_name_normalized
+    ).filter(
+        ClientProfile.customer_phone_normalized.in_(shared_phones)
+    ).order_by(ClientProfile.customer_phone_normalized, ClientProfile.id).all()
+
+    numbers = {row.id: row.client_id_number for row in rows}
+    names = {row.id: row.customer_name_normalized for row in rows}
+    merges = []
+    candidates = []
+    repointed_total = 0
+    try:
+        if not dry_run and rows:
+            # Seed the counter before the newest profile may be deleted, so its number isn't reused
+            client_id_counter()
+        for _, block in groupby(rows, key=lambda row: row.customer_phone_normalized):
+            groups, pairs = _split_block(list(block))
+            for a, b in pairs:
+                candidates.append({
+                    'clients': [numbers[a], numbers[b]],
+                    'names': [names[a], names[b]]
+                })
+            for ids in groups:
+                keep_id = min(ids)
+                duplicate_ids = [i for i in ids if i != keep_id]
+                repointed = 0
+                if not dry_run:
+                    keep_id, duplicate_ids, repointed = _merge_group(ids)
+                    repointed_total += repointed
+                merges.append({
+                    'keep': numbers[keep_id],
+                    'removed': [numbers[i] for i in duplicate_ids],
+                    'requestsRepointed': repointed
+                })
+        if not dry_run:
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {
+        'dryRun': dry_run,
+        'groups': len(merges),
+        'removed': sum(len(m['removed']) for m in merges),
+        'requestsRepointed': repointed_total,
+        'merges': merges,
+        # Similar names on a shared phone, left for a person to confirm and merge
+        'candidates': candidates
+    }
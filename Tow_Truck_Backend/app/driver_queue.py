@@ -0,0 +1,70 @@
+"""Per-driver queue of open service requests.
+
+Each driver's queue is cached in-process as a ready-to-send JSON body
+together with a version read from the database: the count, id sum and
+latest update time of the driver's open jobs and their clients. Every poll
+re-reads that version over the partial index, and the body is only rebuilt
+when it differs, so a change made through any worker process (or a CLI
+job) shows up on the next poll while unchanged queues skip the full query.
+The cache is an LRU of DRIVER_QUEUE_CACHE_SIZE entries, and empty queues
+(which is all an unknown username in the URL can produce) are never cached.
+"""
+from app import db
+from app.models import ServiceRequest, ClientProfile, OPEN_STATUSES, PRIORITY_ORDER, service_request_summary_query, service_request_summary
+from app.http_cache import etag_for
+from collections import OrderedDict
+from flask import current_app
+import json
+import threading
+
+_cache = OrderedDict()  # username -> (version, etag, body)
+_cache_lock = threading.Lock()
+
+def _open_jobs_filter(username):
+    return (ServiceRequest.assigned_to == username, ServiceRequest.status.in_(OPEN_STATUSES))
+
+def _queue_version(username):
+    """Cheap fingerprint of the driver's open jobs, changes whenever the queue would"""
+    row = db.session.execute(
+        db.select(
+            db.func.count(ServiceRequest.id),
+            db.func.coalesce(db.func.sum(ServiceRequest.id), 0),
+            db.func.max(ServiceRequest.last_updated_at),
+            db.func.max(ClientProfile.last_edited_at)
+        ).join(ClientProfile, ClientProfile.id == ServiceRequest.client_id).where(*_open_jobs_filter(username))
+    ).one()
+    return tuple(str(value) for value in row)
+
+def _load_queue(username):
+    priority_rank = db.case(
+        {priority: rank for rank, priority in enumerate(PRIORITY_ORDER)},
+        value=ServiceRequest.priority,
+        else_=len(PRIORITY_ORDER)
+    )
+    query = service_request_summary_query().where(
+        *_open_jobs_filter(username)
+    ).order_by(priority_rank, ServiceRequest.requested_date)
+    return [service_request_summary(row) for row in db.session.execute(query)]
+
+def get_driver_queue(username):
+    """Return (etag, json body) for the driver's open jobs, rebuilding it if the jobs changed"""
+    version = _queue_version(username)
+    with _cache_lock:
+        cached = _cache.get(username)
+        if cached and cached[0] == version:
+            _cache.move_to_end(username)
+            return cached[1], cached[2]
+    jobs = _load_queue(username)
+    body = json.dumps(jobs)
+    etag = etag_for(body)
+    if not jobs:
+        # Nothing to save by caching, and it keeps made-up usernames out of the cache
+        with _cache_lock:
+            _cache.pop(username, None)
+        return etag, body
+    with _cache_lock:
+        _cache[username] = (version, etag, body)
+        _cache.move_to_end(username)
+        while len(_cache) > current_app.config['DRIVER_QUEUE_CACHE_SIZE']:
+            _cache.popitem(last=False)
+    return etag, body
@@ -0,0 +1,14 @@
+"""ETag helpers so polling clients get a cheap 304 when nothing changed"""
+from flask import request, Response
+import hashlib
+
+def etag_for(body):
+    return hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+def conditional_json(body, etag=None):
+    """Return a JSON body with an ETag, or 304 Not Modified if the client already has it"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag or etag_for(body))
+    # Clients may keep the body but must revalidate before using it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
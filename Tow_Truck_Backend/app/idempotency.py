@@ -0,0 +1,146 @@
+"""Idempotency-Key support for create endpoints.
+
+The first request with a given key claims it by inserting an
+idempotency_keys row (the unique constraint picks a single winner among
+concurrent duplicates), runs the view and stores its response. Later
+requests with the same key get the stored response back without touching
+the domain tables. Recent responses are also kept in a small in-process LRU
+so most replays don't reach the database at all.
+"""
+from app import db
+from app.models import IdempotencyKey
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import request, jsonify, make_response, current_app, Response
+from functools import wraps
+from sqlalchemy.exc import IntegrityError
+import hashlib
+import threading
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 200
+PURGE_INTERVAL = timedelta(minutes=10)
+
+_cache = OrderedDict()  # key -> (request_hash, status, body, expires_at)
+_cache_lock = threading.Lock()
+_last_purge = datetime.min
+
+def _ttl():
+    return timedelta(hours=current_app.config['IDEMPOTENCY_TTL_HOURS'])
+
+def _cache_get(key):
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+        if entry[3] < datetime.utcnow():
+            del _cache[key]
+            return None
+        _cache.move_to_end(key)
+        return entry
+
+def _cache_put(key, request_hash, status, body, created_at):
+    with _cache_lock:
+        _cache[key] = (request_hash, status, body, created_at + _ttl())
+        _cache.move_to_end(key)
+        while len(_cache) > current_app.config['IDEMPOTENCY_CACHE_SIZE']:
+            _cache.popitem(last=False)
+
+def purge_expired_idempotency_keys():
+    """Delete stored keys older than the TTL; returns how many were removed"""
+    cutoff = datetime.utcnow() - _ttl()
+    removed = IdempotencyKey.query.filter(IdempotencyKey.created_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+def _maybe_purge():
+    global _last_purge
+    now = datetime.utcnow()
+    if now - _last_purge < PURGE_INTERVAL:
+        return
+    _last_purge = now
+    try:
+        removed = purge_expired_idempotency_keys()
+        if removed:
+            print(f"[IDEMPOTENCY] Purged {removed} expired keys")
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR purging idempotency keys: {str(e)}")
+
+def _claim(key, request_hash):
+    """Insert the key row; returns None when we won, otherwise the existing row"""
+    for _ in range(2):
+        db.session.add(IdempotencyKey(key=key, request_hash=request_hash))
+        try:
+            db.session.commit()
+            return None
+        except IntegrityError:
+            db.session.rollback()
+        existing = IdempotencyKey.query.filter_by(key=key).first()
+        if existing is None:
+            continue  # Deleted between our insert and select, try again
+        if existing.created_at >= datetime.utcnow() - _ttl():
+            return existing
+        # Expired but not purged yet, take it over
+        db.session.delete(existing)
+        db.session.commit()
+    return IdempotencyKey.query.filter_by(key=key).first()
+
+def _replay(request_hash, stored_hash, status, body):
+    if stored_hash != request_hash:
+        return jsonify({'error': f'{HEADER} was already used with a different request'}), 422
+    response = Response(body, status=status, mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def idempotent(view):
+    """Honor the Idempotency-Key header on a create route"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        header = request.headers.get(HEADER)
+        if not header:
+            return view(*args, **kwargs)
+        if len(header) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+        key = f"{request.method} {request.path} {header}"
+        request_hash = hashlib.sha256(request.get_data()).hexdigest()
+
+        cached = _cache_get(key)
+        if cached:
+            return _replay(request_hash, cached[0], cached[1], cached[2])
+
+        _maybe_purge()
+        existing = _claim(key, request_hash)
+        if existing is not None:
+            if existing.status != 'completed':
+                response = jsonify({'error': 'A request with this Idempotency-Key is still being processed'})
+                response.headers['Retry-After'] = '1'
+                return response, 409
+            _cache_put(key, existing.request_hash, existing.response_status, existing.response_body, existing.created_at)
+            return _replay(request_hash, existing.request_hash, existing.response_status, existing.response_body)
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            IdempotencyKey.query.filter_by(key=key).delete(synchronize_session=False)
+            db.session.commit()
+            raise
+
+        record = IdempotencyKey.query.filter_by(key=key).first()
+        if record is None:
+            return response
+        if response.status_code >= 500:
+            # Nothing was created, let the client retry with the same key
+            db.session.delete(record)
+            db.session.commit()
+            return response
+
+        record.status = 'completed'
+        record.response_status = response.status_code
+        record.response_body = response.get_data(as_text=True)
+        db.session.commit()
+        _cache_put(key, request_hash, record.response_status, record.response_body, record.created_at)
+        return response
+    return wrapper
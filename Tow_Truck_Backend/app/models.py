@@ -1,29 +1,84 @@
 from app import db
 from datetime import datetime
+from sqlalchemy.orm import validates
 from werkzeug.security import generate_password_hash, check_password_hash
+import os
+import re
+import unicodedata
+
+# Statuses of jobs still waiting on a driver, see ix_service_requests_open_by_assignee
+OPEN_STATUSES = ('Pending', 'Assigned', 'In Progress')
+PRIORITY_ORDER = ('Emergency', 'High', 'Medium', 'Low')
+
+# Country code assumed for phone numbers entered without one
+DEFAULT_PHONE_COUNTRY_CODE = os.environ.get('DEFAULT_PHONE_COUNTRY_CODE', '1')
+NATIONAL_PHONE_LENGTH = 10
+
+def normalize_phone(phone):
+    """Normalize a phone number to E.164 style (e.g., "(787) 555-1234" -> "+17875551234")"""
+    if not phone:
+        return None
+    digits = re.sub(r'\D', '', phone)
+    if not digits:
+        return None
+    if phone.strip().startswith('+'):
+        return f"+{digits}"
+    if digits.startswith('00'):
+        return f"+{digits[2:]}"
+    if len(digits) == NATIONAL_PHONE_LENGTH:
+        return f"+{DEFAULT_PHONE_COUNTRY_CODE}{digits}"
+    if len(digits) == NATIONAL_PHONE_LENGTH + len(DEFAULT_PHONE_COUNTRY_CODE) and digits.startswith(DEFAULT_PHONE_COUNTRY_CODE):
+        return f"+{digits}"
+    # Too short or ambiguous to place, keep the bare digits so it still compares
+    return digits
+
+def normalize_name(*parts):
+    """Fold a name for comparison: no accents, case-folded, single spaces (e.g., "José  Pérez" -> "jose perez")"""
+    name = ' '.join(part for part in parts if part)
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(ch for ch in name if not unicodedata.combining(ch)).casefold()
+    return ' '.join(re.sub(r'[^\w]+', ' ', name).split())
+
+def client_id_counter():
+    """Counter row holding the last client number handed out, locked for this transaction.
+    
+    Seeded from the newest client the first time; after that it only moves
+    forward, so numbers of merged or deleted clients are never given out again.
+    """
+    counter = IdCounter.query.filter_by(name='client_id_number').with_for_update().first()
+    if counter is None:
+        last_client = ClientProfile.query.order_by(ClientProfile.id.desc()).first()
+        # Extract the number from the last ID (e.g., "CLI000000005" -> 5)
+        last_num = int(last_client.client_id_number.replace('CLI', '')) if last_client else 0
+        counter = IdCounter(name='client_id_number', value=last_num)
+        db.session.add(counter)
+    return counter
 
 def generate_client_id_number():
     """Generate next sequential client ID number"""
-    last_client = ClientProfile.query.order_by(ClientProfile.id.desc()).first()
-    if last_client:
-        # Extract the number from the last ID (e.g., "CLI000000005" -> 5)
-        last_num = int(last_client.client_id_number.replace('CLI', ''))
-        next_num = last_num + 1
-    else:
-        next_num = 1
-    return f"CLI{next_num:09d}"  # CLI000000001, CLI000000002, etc
+    counter = client_id_counter()
+    counter.value += 1
+    return f"CLI{counter.value:09d}"  # CLI000000001, CLI000000002, etc
 
 def generate_service_request_number():
     """Generate next sequential service request number"""
-    last_sr = ServiceRequest.query.order_by(ServiceRequest.id.desc()).first()
-    if last_sr:
-        # Extract the number from the last ID (e.g., "SR000000005" -> 5)
-        last_num = int(last_sr.service_request_number.replace('SR', ''))
-        next_num = last_num + 1
-    else:
-        next_num = 1
+    last_num = 0
+    # Archived requests keep their numbers, so both tables have to be checked
+    for model in (ServiceRequest, ArchivedServiceRequest):
+        last_sr = model.query.order_by(model.id.desc()).first()
+        if last_sr:
+            # Extract the number from the last ID (e.g., "SR000000005" -> 5)
+            last_num = max(last_num, int(last_sr.service_request_number.replace('SR', '')))
+    next_num = last_num + 1
     return f"SR{next_num:09d}"  # SR000000001, SR000000002, etc
 
+class IdCounter(db.Model):
+    """Last sequential number handed out, per numbering scheme"""
+    __tablename__ = 'id_counters'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
 class User(db.Model):
     __tablename__ = 'users'
     
@@ -66,6 +121,19 @@ class ClientProfile(db.Model):
     last_edited_by_name = db.Column(db.String(120), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_edited_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Normalized copies used for duplicate detection, kept in sync by _normalize below
+    customer_phone_normalized = db.Column(db.String(20), nullable=True, index=True)
+    customer_name_normalized = db.Column(db.String(200), nullable=True, index=True)
+    
+    @validates('customer_first_name', 'customer_last_name', 'customer_phone')
+    def _normalize(self, key, value):
+        if key == 'customer_phone':
+            self.customer_phone_normalized = normalize_phone(value)
+        else:
+            first = value if key == 'customer_first_name' else self.customer_first_name
+            last = value if key == 'customer_last_name' else self.customer_last_name
+            self.customer_name_normalized = normalize_name(first, last)
+        return value
     
     def to_dict(self):
         return {
@@ -81,12 +149,8 @@ class ClientProfile(db.Model):
             'lastEditedDate': self.last_edited_at.strftime('%Y-%m-%d')
         }
 
-class ServiceRequest(db.Model):
-    __tablename__ = 'service_requests'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    service_request_number = db.Column(db.String(20), unique=True, nullable=False)  # SR000000001, SR000000002, etc
-    client_id = db.Column(db.Integer, db.ForeignKey('client_profiles.id'), nullable=False)
+class ServiceRequestMixin:
+    """Columns and serialization shared by hot and archived service requests"""
     vehicle_year = db.Column(db.String(4), nullable=False)
     vehicle_make = db.Column(db.String(80), nullable=False)
     vehicle_model = db.Column(db.String(80), nullable=False)
@@ -102,7 +166,6 @@ class ServiceRequest(db.Model):
     assigned_to = db.Column(db.String(80), nullable=True)
     assigned_to_name = db.Column(db.String(120), nullable=True)
     requested_date = db.Column(db.DateTime, nullable=False)
-    completion_date = db.Column(db.DateTime, nullable=True)
     cost = db.Column(db.Float, default=0.0)
     notes = db.Column(db.Text, nullable=True)
     created_by = db.Column(db.String(80), nullable=False)
@@ -112,6 +175,8 @@ class ServiceRequest(db.Model):
     last_edited_by_name = db.Column(db.String(120), nullable=True)
     last_updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    archived = False
+    
     def to_dict(self):
         # Get client name from client_profiles
         client_name = "Unknown"
@@ -155,5 +220,156 @@ class ServiceRequest(db.Model):
             'createdDate': self.created_at.strftime('%Y-%m-%d'),
             'lastEditedBy': self.last_edited_by,
             'lastEditedByName': self.last_edited_by_name,
-            'lastUpdatedDate': self.last_updated_at.strftime('%Y-%m-%d')
+            'lastUpdatedDate': self.last_updated_at.strftime('%Y-%m-%d'),
+            'archived': self.archived
         }
+
+def preload_clients(service_requests):
+    """Load the clients of service_requests in one query so to_dict() finds them in the session.
+
+    Keep the returned list until serializing is done, the session only holds weak references.
+    """
+    client_ids = {sr.client_id for sr in service_requests if sr.client_id}
+    if not client_ids:
+        return []
+    return ClientProfile.query.filter(ClientProfile.id.in_(client_ids)).all()
+
+class ServiceRequest(ServiceRequestMixin, db.Model):
+    __tablename__ = 'service_requests'
+    __table_args__ = (
+        # Partial index serving the per-driver work queue (open jobs only)
+        db.Index(
+            'ix_service_requests_open_by_assignee', 'assigned_to', 'requested_date',
+            postgresql_where=db.text(f"status IN {OPEN_STATUSES}"),
+            sqlite_where=db.text(f"status IN {OPEN_STATUSES}")
+        ),
+        # Archived rows keep their ids, so SQLite must not hand them out again
+        {'sqlite_autoincrement': True},
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    service_request_number = db.Column(db.String(20), unique=True, nullable=False)  # SR000000001, SR000000002, etc
+    client_id = db.Column(db.Integer, db.ForeignKey('client_profiles.id'), nullable=False)
+    completion_date = db.Column(db.DateTime, nullable=True)
+
+def service_request_summary_query():
+    """Lean select of service requests with their client, leaving out notes, description and audit fields"""
+    return db.select(
+        ServiceRequest.id,
+        ServiceRequest.service_request_number,
+        ServiceRequest.client_id,
+        ClientProfile.client_id_number,
+        ClientProfile.customer_first_name,
+        ClientProfile.customer_last_name,
+        ClientProfile.customer_phone,
+        ServiceRequest.vehicle_year,
+        ServiceRequest.vehicle_make,
+        ServiceRequest.vehicle_model,
+        ServiceRequest.vehicle_plate,
+        ServiceRequest.vehicle_color,
+        ServiceRequest.vehicle_location,
+        ServiceRequest.is_dangerous,
+        ServiceRequest.has_heavy_traffic,
+        ServiceRequest.job_type,
+        ServiceRequest.priority,
+        ServiceRequest.status,
+        ServiceRequest.assigned_to,
+        ServiceRequest.assigned_to_name,
+        ServiceRequest.requested_date,
+        ServiceRequest.cost
+    ).join(ClientProfile, ClientProfile.id == ServiceRequest.client_id)
+
+def service_request_summary(row):
+    """Serialize a service_request_summary_query() row with the same keys as ServiceRequest.to_dict"""
+    return {
+        'id': row.id,
+        'serviceRequestNumber': row.service_request_number,
+        'clientId': row.client_id,
+        'clientIdNumber': row.client_id_number,
+        'clientName': f"{row.customer_first_name} {row.customer_last_name}",
+        'clientPhone': row.customer_phone,
+        'vehicleYear': row.vehicle_year,
+        'vehicleMake': row.vehicle_make,
+        'vehicleModel': row.vehicle_model,
+        'vehiclePlate': row.vehicle_plate,
+        'vehicleColor': row.vehicle_color,
+        'vehicleLocation': row.vehicle_location,
+        'isDangerous': row.is_dangerous,
+        'hasHeavyTraffic': row.has_heavy_traffic,
+        'jobType': row.job_type,
+        'priority': row.priority,
+        'status': row.status,
+        'assignedTo': row.assigned_to,
+        'assignedToName': row.assigned_to_name,
+        'requestedDate': row.requested_date.strftime('%Y-%m-%d %H:%M'),
+        'cost': row.cost
+    }
+
+def client_summary_query():
+    """Lean select of clients for pickers and lists"""
+    return db.select(
+        ClientProfile.id,
+        ClientProfile.client_id_number,
+        ClientProfile.customer_first_name,
+        ClientProfile.customer_last_name,
+        ClientProfile.customer_phone
+    )
+
+def client_summary(row):
+    return {
+        'id': row.id,
+        'clientIdNumber': row.client_id_number,
+        'CustomerFirstName': row.customer_first_name,
+        'CustomerLastName': row.customer_last_name,
+        'CustomerPhone': row.customer_phone
+    }
+
+def user_summary_query():
+    """Lean select of users for assignment dropdowns"""
+    return db.select(User.id, User.username, User.name, User.role)
+
+def user_summary(row):
+    return {
+        'id': row.id,
+        'username': row.username,
+        'name': row.name,
+        'role': row.role
+    }
+
+class ArchivedServiceRequest(ServiceRequestMixin, db.Model):
+    """Completed service requests moved out of the hot table by app.archive.
+    
+    On Postgres the table is range-partitioned by month on completion_date,
+    so the partition key has to be part of the primary key.
+    """
+    __tablename__ = 'service_requests_archive'
+    __table_args__ = {'postgresql_partition_by': 'RANGE (completion_date)'}
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Keeps the id from service_requests
+    completion_date = db.Column(db.DateTime, primary_key=True)
+    service_request_number = db.Column(db.String(20), nullable=False, index=True)
+    client_id = db.Column(db.Integer, db.ForeignKey('client_profiles.id'), nullable=False, index=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    archived = True
+
+def client_request_counts():
+    """Service requests per client id, archived ones included, from two grouped counts"""
+    counts = {}
+    for model in (ServiceRequest, ArchivedServiceRequest):
+        rows = db.session.query(model.client_id, db.func.count(model.id)).group_by(model.client_id)
+        for client_id, count in rows:
+            counts[client_id] = counts.get(client_id, 0) + count
+    return counts
+
+class IdempotencyKey(db.Model):
+    """Stored outcome of a create request sent with an Idempotency-Key header (see app.idempotency)"""
+    __tablename__ = 'idempotency_keys'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(255), unique=True, nullable=False)  # "POST /api/clients <header value>"
+    request_hash = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='in_progress')  # in_progress, completed
+    response_status = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
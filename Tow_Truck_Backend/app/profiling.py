@@ -0,0 +1,147 @@
+"""Opt-in per-request SQL profiling for development and CI.
+
+Enable with create_app(profile_sql=True) or SQL_PROFILING=1. Every SQL
+statement run while handling a request is recorded with its duration and a
+normalized "shape" (literals and parameters replaced by ?), so the same
+query repeated with different ids, the usual sign of an N+1, shows up as one
+shape with a high count. Each response gets a Server-Timing header, and a
+per-endpoint report is written to SQL_PROFILE_REPORT when the process exits
+(also available from GET /api/db/profile).
+
+See app.pytest_plugin for failing tests on a query budget.
+"""
+from collections import Counter, deque
+from flask import g, request, jsonify, has_request_context
+from sqlalchemy import event
+from time import perf_counter
+import atexit
+import json
+import re
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_NAMED_PARAM = re.compile(r"%\(\w+\)s|:\w+|\$\d+|%s")
+_PARAM_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_POSTCOMPILE = re.compile(r"\(?__\[POSTCOMPILE_\w+\]\)?")
+_WHITESPACE = re.compile(r"\s+")
+
+# Execution option carrying a request's query log to connections used from other threads
+QUERY_LOG_OPTION = 'sql_profiler_queries'
+
+def request_query_log():
+    """The current request's query log when profiling is on, otherwise None.
+
+    Pass it to work running on other threads and set it on their connections with
+    conn.execution_options(**{QUERY_LOG_OPTION: log}) so their queries are counted too.
+    """
+    if has_request_context():
+        return g.get('sql_queries')
+    return None
+
+def normalize_statement(statement):
+    """Reduce a SQL statement to its shape, e.g. "... WHERE id = 5" -> "... WHERE id = ?" """
+    shape = _STRING.sub('?', statement)
+    shape = _POSTCOMPILE.sub('(?...)', shape)
+    shape = _NAMED_PARAM.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PARAM_LIST.sub('(?...)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+class SQLProfiler:
+    """Records SQL statements per request for one app and its engine"""
+
+    def __init__(self, app, engine):
+        self.report_path = app.config['SQL_PROFILE_REPORT']
+        self.n_plus_one_threshold = app.config['SQL_N_PLUS_ONE_THRESHOLD']
+        self.endpoints = {}
+        self.requests = deque(maxlen=1000)  # Recent per-request records, used by the pytest plugin
+        self.request_count = 0
+
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule('/api/db/profile', 'sql_profile', lambda: (jsonify(self.report()), 200))
+        app.extensions['sql_profiler'] = self
+        if self.report_path:
+            atexit.register(self.write_report)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('sql_profiler_start', []).append(perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['sql_profiler_start'].pop()
+        queries = context.execution_options.get(QUERY_LOG_OPTION) if context is not None else None
+        if queries is None:
+            queries = request_query_log()
+        if queries is not None:
+            queries.append((statement, (perf_counter() - started) * 1000))
+
+    def _start_request(self):
+        g.sql_queries = []
+        g.sql_profiler_start = perf_counter()
+
+    def _finish_request(self, response):
+        if 'sql_queries' not in g:
+            return response
+        total_ms = (perf_counter() - g.sql_profiler_start) * 1000
+        db_ms = sum(duration for _, duration in g.sql_queries)
+        shapes = Counter(normalize_statement(statement) for statement, _ in g.sql_queries)
+        repeated = {shape: count for shape, count in shapes.items() if count >= self.n_plus_one_threshold}
+        endpoint = request.endpoint or request.path
+
+        for shape, count in repeated.items():
+            print(f"[SQL PROFILE] Possible N+1 in {endpoint}: {count}x {shape[:200]}")
+
+        self.request_count += 1
+        self.requests.append({
+            'seq': self.request_count,
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.path,
+            'queries': len(g.sql_queries),
+            'dbMs': round(db_ms, 2),
+            'totalMs': round(total_ms, 2),
+            'repeatedShapes': repeated
+        })
+
+        stats = self.endpoints.setdefault(endpoint, {
+            'requests': 0, 'queries': 0, 'maxQueries': 0, 'dbMs': 0.0, 'maxDbMs': 0.0, 'shapes': {}, 'nPlusOne': {}
+        })
+        stats['requests'] += 1
+        stats['queries'] += len(g.sql_queries)
+        stats['maxQueries'] = max(stats['maxQueries'], len(g.sql_queries))
+        stats['dbMs'] += db_ms
+        stats['maxDbMs'] = max(stats['maxDbMs'], db_ms)
+        for shape, count in shapes.items():
+            stats['shapes'][shape] = max(stats['shapes'].get(shape, 0), count)
+        for shape, count in repeated.items():
+            stats['nPlusOne'][shape] = max(stats['nPlusOne'].get(shape, 0), count)
+
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={db_ms:.1f};desc="{len(g.sql_queries)} queries", app;dur={total_ms:.1f}'
+        )
+        return response
+
+    def report(self):
+        """Per-endpoint summary, slowest endpoints (by total database time) first"""
+        report = {}
+        for endpoint, stats in sorted(self.endpoints.items(), key=lambda item: -item[1]['dbMs']):
+            report[endpoint] = {
+                'requests': stats['requests'],
+                'avgQueries': round(stats['queries'] / stats['requests'], 2),
+                'maxQueries': stats['maxQueries'],
+                'avgDbMs': round(stats['dbMs'] / stats['requests'], 2),
+                'maxDbMs': round(stats['maxDbMs'], 2),
+                # Highest per-request count for each statement shape
+                'shapes': dict(sorted(stats['shapes'].items(), key=lambda item: -item[1])),
+                'nPlusOne': stats['nPlusOne']
+            }
+        return report
+
+    def write_report(self, path=None):
+        path = path or self.report_path
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        print(f"[SQL PROFILE] Wrote report for {len(self.endpoints)} endpoints to {path}")
@@ -0,0 +1,80 @@
+"""pytest plugin enforcing SQL query budgets with app.profiling.
+
+Enable it from a conftest.py that provides an `app` fixture built with
+create_app(profile_sql=True):
+
+    pytest_plugins = ['app.pytest_plugin']
+
+Then declare budgets per test:
+
+    @pytest.mark.query_budget(3)
+    @pytest.mark.query_budget(2, endpoint='service_requests.get_service_request')
+
+or for every test at once in app.config['SQL_QUERY_BUDGETS'] as
+{endpoint: max_queries}. A test fails when any request made in its body
+runs more statements than its budget; the report lists the repeated
+statement shapes. Requests made by fixtures are not checked.
+"""
+import pytest
+
+_budget_state = pytest.StashKey()
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers',
+        'query_budget(max_queries, endpoint=None): fail if a request made by the test '
+        'runs more than max_queries SQL statements'
+    )
+
+@pytest.fixture
+def sql_profiler(app):
+    profiler = app.extensions.get('sql_profiler')
+    if profiler is None:
+        pytest.fail('SQL profiling is off: build the app fixture with create_app(profile_sql=True)')
+    return profiler
+
+def _budgets(item, app):
+    budgets = []
+    for marker in item.iter_markers('query_budget'):
+        max_queries = marker.args[0] if marker.args else marker.kwargs['max_queries']
+        budgets.append((marker.kwargs.get('endpoint'), max_queries))
+    for endpoint, max_queries in app.config.get('SQL_QUERY_BUDGETS', {}).items():
+        budgets.append((endpoint, max_queries))
+    return budgets
+
+def _describe(record):
+    lines = [f"{record['method']} {record['path']} ({record['endpoint']}) ran {record['queries']} queries"]
+    for shape, count in record['repeatedShapes'].items():
+        lines.append(f"    {count}x {shape[:200]}")
+    return '\n'.join(lines)
+
+@pytest.fixture(autouse=True)
+def _query_budget_start(request):
+    """Remember where the profiler stood when the test body starts"""
+    if 'app' not in request.fixturenames:
+        return
+    app = request.getfixturevalue('app')
+    profiler = app.extensions.get('sql_profiler')
+    budgets = _budgets(request.node, app)
+    if profiler is not None and budgets:
+        request.node.stash[_budget_state] = (profiler, profiler.request_count, budgets)
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    # Checked in the call phase so a blown budget is reported as a test failure
+    result = yield
+    state = item.stash.get(_budget_state, None)
+    if state is None:
+        return result
+
+    profiler, start, budgets = state
+    failures = []
+    for record in profiler.requests:
+        if record['seq'] <= start:
+            continue
+        for endpoint, max_queries in budgets:
+            if endpoint in (None, record['endpoint']) and record['queries'] > max_queries:
+                failures.append(f"budget {max_queries}: {_describe(record)}")
+    if failures:
+        pytest.fail('Query budget exceeded:\n' + '\n'.join(failures), pytrace=False)
+    return result
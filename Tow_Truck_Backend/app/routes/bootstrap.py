@@ -0,0 +1,77 @@
+from flask import Blueprint, request, jsonify
+from app import db
+from app.models import (ServiceRequest, ClientProfile, User,
+                        service_request_summary_query, service_request_summary,
+                        client_summary_query, client_summary,
+                        user_summary_query, user_summary)
+from app.http_cache import conditional_json
+from app.profiling import QUERY_LOG_OPTION, request_query_log
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+
+bp = Blueprint('bootstrap', __name__, url_prefix='/api/bootstrap')
+
+# Lean lists the frontend screens need, each loaded on its own pooled connection
+SECTIONS = {
+    'serviceRequests': (lambda: service_request_summary_query().order_by(ServiceRequest.id), service_request_summary),
+    'clients': (lambda: client_summary_query().order_by(ClientProfile.id), client_summary),
+    'users': (lambda: user_summary_query().order_by(User.id), user_summary)
+}
+
+# Shared by every request in this process. Sized so BOOTSTRAP_CONCURRENCY bootstrap
+# calls can load all their sections at once instead of queueing behind each other.
+# Each worker holds a pooled connection while it runs, and SQLAlchemy's default pool
+# allows 15 per process (pool_size 5 + max_overflow 10): the default 3 calls use 9,
+# leaving 6 for request threads' own sessions. Grow the engine pool along with it.
+BOOTSTRAP_CONCURRENCY = int(os.environ.get('BOOTSTRAP_CONCURRENCY', 3))
+_executor = ThreadPoolExecutor(max_workers=len(SECTIONS) * BOOTSTRAP_CONCURRENCY, thread_name_prefix='bootstrap')
+
+def _load_section(engine, name, query_log):
+    query, serialize = SECTIONS[name]
+    with engine.connect() as conn:
+        if query_log is not None:
+            conn.execution_options(**{QUERY_LOG_OPTION: query_log})
+        return [serialize(row) for row in conn.execute(query())]
+
+def _select_fields(items, fields):
+    if not fields:
+        return items
+    return [{key: item[key] for key in fields if key in item} for item in items]
+
+@bp.route('', methods=['GET'])
+def get_bootstrap():
+    """Several lists in one round trip.
+    
+    ?include=serviceRequests,clients,users picks the lists (all by default),
+    ?fields[clients]=id,CustomerFirstName trims a list to the given keys and
+    ?service_request_id=5 adds the full serviceRequest for an edit screen.
+    The response carries an ETag, so an unchanged screen costs a 304.
+    """
+    try:
+        include = [name for name in request.args.get('include', ','.join(SECTIONS)).split(',') if name]
+        unknown = [name for name in include if name not in SECTIONS]
+        if unknown:
+            return jsonify({'error': f"Unknown bootstrap sections: {', '.join(unknown)}"}), 400
+        
+        engine = db.engine
+        query_log = request_query_log()
+        futures = {name: _executor.submit(_load_section, engine, name, query_log) for name in include}
+        
+        payload = {}
+        service_request_id = request.args.get('service_request_id', type=int)
+        if service_request_id:
+            # Loaded on the request's own session while the lists run in the background
+            service_req = ServiceRequest.query.get(service_request_id)
+            if not service_req:
+                return jsonify({'error': 'Service request not found'}), 404
+            payload['serviceRequest'] = service_req.to_dict()
+        
+        for name, future in futures.items():
+            fields = [f for f in request.args.get(f'fields[{name}]', '').split(',') if f]
+            payload[name] = _select_fields(future.result(), fields)
+        
+        return conditional_json(json.dumps(payload))
+    except Exception as e:
+        print(f"ERROR in get_bootstrap: {str(e)}")
+        return jsonify({'error': str(e)}), 500
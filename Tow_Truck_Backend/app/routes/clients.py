@@ -1,13 +1,21 @@
 from flask import Blueprint, request, jsonify
 from app import db
-from app.models import ClientProfile, generate_client_id_number
+from app.models import ClientProfile, generate_client_id_number, client_request_counts
+from app.dedupe import find_duplicate_clients, merge_duplicate_clients
+from app.idempotency import idempotent
 
 bp = Blueprint('clients', __name__, url_prefix='/api/clients')
 
 @bp.route('', methods=['GET'])
 def get_clients():
     profiles = ClientProfile.query.all()
-    return jsonify([profile.to_dict() for profile in profiles]), 200
+    counts = client_request_counts()
+    result = []
+    for profile in profiles:
+        profile_dict = profile.to_dict()
+        profile_dict['requestCount'] = counts.get(profile.id, 0)
+        result.append(profile_dict)
+    return jsonify(result), 200
 
 @bp.route('/<int:client_id>', methods=['GET'])
 def get_client(client_id):
@@ -17,6 +25,7 @@ def get_client(client_id):
     return jsonify(profile.to_dict()), 200
 
 @bp.route('', methods=['POST'])
+@idempotent
 def create_client():
     try:
         data = request.get_json()
@@ -24,6 +33,20 @@ def create_client():
         if not data or not data.get('customer_first_name') or not data.get('customer_last_name'):
             return jsonify({'error': 'Missing required fields'}), 400
         
+        # Refuse exact duplicates unless told otherwise; reuse_existing hands back the existing profile
+        exact, possible = find_duplicate_clients(
+            data.get('customer_first_name'),
+            data.get('customer_last_name'),
+            data.get('customer_phone')
+        )
+        if exact and not data.get('force'):
+            if data.get('reuse_existing'):
+                return jsonify({'message': 'Existing client reused', 'client': exact[0].to_dict(), 'duplicate': True}), 200
+            return jsonify({
+                'error': f'Client already exists: {exact[0].client_id_number}',
+                'duplicates': [c.to_dict() for c in exact]
+            }), 409
+        
         # Generate sequential client ID number
         client_id_number = generate_client_id_number()
         
@@ -41,7 +64,11 @@ def create_client():
         db.session.add(profile)
         db.session.commit()
         
-        return jsonify({'message': 'Client created', 'client': profile.to_dict()}), 201
+        return jsonify({
+            'message': 'Client created',
+            'client': profile.to_dict(),
+            'possibleDuplicates': [c.to_dict() for c in exact + possible]
+        }), 201
     except Exception as e:
         db.session.rollback()
         print(f"ERROR creating client: {str(e)}")
@@ -113,3 +140,31 @@ def search_clients():
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@bp.route('/duplicates', methods=['GET'])
+def check_duplicate_clients():
+    """Check for existing clients before creating one (?first_name=&last_name=&phone=)"""
+    try:
+        exact, possible = find_duplicate_clients(
+            request.args.get('first_name', ''),
+            request.args.get('last_name', ''),
+            request.args.get('phone', '')
+        )
+        return jsonify({
+            'exact': [c.to_dict() for c in exact],
+            'possible': [c.to_dict() for c in possible]
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/dedupe', methods=['POST'])
+def dedupe_clients():
+    """Report duplicate clients; send {"dry_run": false} to actually merge them"""
+    try:
+        data = request.get_json(silent=True) or {}
+        # Anything but an explicit false is a dry run, so an empty body never deletes clients
+        result = merge_duplicate_clients(dry_run=data.get('dry_run', True) is not False)
+        return jsonify(result), 200
+    except Exception as e:
+        print(f"ERROR deduping clients: {str(e)}")
+        return jsonify({'error': str(e)}), 500
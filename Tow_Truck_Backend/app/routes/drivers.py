@@ -0,0 +1,14 @@
+from flask import Blueprint, jsonify
+from app.driver_queue import get_driver_queue
+from app.http_cache import conditional_json
+
+bp = Blueprint('drivers', __name__, url_prefix='/api/drivers')
+
+@bp.route('/<username>/queue', methods=['GET'])
+def get_queue(username):
+    """Open jobs assigned to a driver, most urgent first"""
+    try:
+        etag, body = get_driver_queue(username)
+        return conditional_json(body, etag)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,14 +1,23 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app import db
-from app.models import ServiceRequest, ClientProfile, generate_service_request_number
+from app.models import ServiceRequest, ArchivedServiceRequest, ClientProfile, generate_service_request_number, preload_clients
+from app.archive import archive_completed_requests, archive_table_stats
+from app.idempotency import idempotent
 from datetime import datetime
 
 bp = Blueprint('service_requests', __name__, url_prefix='/api/service-requests')
 
+def include_archived():
+    """Whether the caller asked for archived requests too (?include_archived=true)"""
+    return request.args.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
 @bp.route('', methods=['GET'])
 def get_service_requests():
     try:
         requests_list = ServiceRequest.query.all()
+        if include_archived():
+            requests_list += ArchivedServiceRequest.query.all()
+        clients = preload_clients(requests_list)  # One query instead of one per row
         return jsonify([r.to_dict() for r in requests_list]), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -17,6 +26,8 @@ def get_service_requests():
 def get_service_request(request_id):
     try:
         service_req = ServiceRequest.query.get(request_id)
+        if not service_req and include_archived():
+            service_req = ArchivedServiceRequest.query.filter_by(id=request_id).first()
         if not service_req:
             return jsonify({'error': 'Service request not found'}), 404
         return jsonify(service_req.to_dict()), 200
@@ -27,11 +38,14 @@ def get_service_request(request_id):
 def get_client_service_requests(client_id):
     try:
         requests_list = ServiceRequest.query.filter_by(client_id=client_id).all()
+        if include_archived():
+            requests_list += ArchivedServiceRequest.query.filter_by(client_id=client_id).all()
         return jsonify([r.to_dict() for r in requests_list]), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @bp.route('', methods=['POST'])
+@idempotent
 def create_service_request():
     try:
         data = request.get_json()
@@ -81,6 +95,7 @@ def create_service_request():
             assigned_to=data.get('assigned_to'),
             assigned_to_name=data.get('assigned_to_name'),
             requested_date=requested_date,
+            completion_date=datetime.utcnow() if data.get('status') == 'Completed' else None,
             cost=data.get('cost', 0.0),
             notes=data.get('notes', ''),
             created_by=data.get('created_by'),
@@ -148,6 +163,12 @@ def update_service_request(request_id):
             service_req.notes = data['notes']
         if 'completion_date' in data and data['completion_date']:
             service_req.completion_date = datetime.fromisoformat(data['completion_date'])
+        elif service_req.status == 'Completed' and not service_req.completion_date:
+            # The frontend never sends a date; archiving and its partitions depend on it
+            service_req.completion_date = datetime.utcnow()
+        elif service_req.status != 'Completed':
+            # Reopened jobs get a fresh date when they are completed again
+            service_req.completion_date = None
         
         # Track who edited it
         if 'last_edited_by' in data:
@@ -185,6 +206,12 @@ def get_service_stats():
         in_progress = ServiceRequest.query.filter_by(status='In Progress').count()
         completed = ServiceRequest.query.filter_by(status='Completed').count()
         
+        if include_archived():
+            # Only completed requests are ever archived
+            archived = ArchivedServiceRequest.query.count()
+            total += archived
+            completed += archived
+        
         return jsonify({
             'total': total,
             'pending': pending,
@@ -193,3 +220,26 @@ def get_service_stats():
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@bp.route('/archive', methods=['POST'])
+def run_archive():
+    """Run the archive mover now; body may override older_than_days, batch_size and max_batches"""
+    try:
+        data = request.get_json(silent=True) or {}
+        result = archive_completed_requests(
+            older_than_days=int(data.get('older_than_days', current_app.config['ARCHIVE_AFTER_DAYS'])),
+            batch_size=int(data.get('batch_size', current_app.config['ARCHIVE_BATCH_SIZE'])),
+            max_batches=int(data['max_batches']) if data.get('max_batches') else None
+        )
+        return jsonify({'message': 'Archive complete', **result}), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"ERROR in run_archive: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/archive/stats', methods=['GET'])
+def get_archive_stats():
+    try:
+        return jsonify(archive_table_stats()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
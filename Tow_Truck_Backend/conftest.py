@@ -0,0 +1,14 @@
+import pytest
+
+pytest_plugins = ['app.pytest_plugin']
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv('SQL_PROFILE_REPORT', '')  # No report file at exit
+    from app import create_app
+    return create_app(profile_sql=True)
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models import ClientProfile, ServiceRequest, ArchivedServiceRequest
+import pytest
+
+CLIENTS = 10
+
+def seed(app):
+    """One open and one archived service request for each of CLIENTS clients"""
+    with app.app_context():
+        for i in range(1, CLIENTS + 1):
+            client = ClientProfile(
+                client_id_number=f"CLI{i:09d}",
+                customer_first_name=f"Client{i}",
+                customer_last_name='Test',
+                customer_phone=f"555000{i:04d}",
+                created_by='admin',
+                created_by_name='Admin',
+                last_edited_by='admin',
+                last_edited_by_name='Admin'
+            )
+            db.session.add(client)
+            db.session.flush()
+            fields = dict(
+                client_id=client.id,
+                vehicle_year='2020',
+                vehicle_make='Ford',
+                vehicle_model='F-150',
+                vehicle_plate=f"PLATE{i}",
+                vehicle_color='Red',
+                vehicle_location='Main St',
+                job_type='Tow',
+                description='Test job',
+                requested_date=datetime.utcnow(),
+                created_by='admin',
+                created_by_name='Admin'
+            )
+            db.session.add(ServiceRequest(service_request_number=f"SR{i:09d}", **fields))
+            db.session.add(ArchivedServiceRequest(
+                id=1000 + i,
+                service_request_number=f"SR{1000 + i:09d}",
+                status='Completed',
+                completion_date=datetime.utcnow() - timedelta(days=365),
+                **fields
+            ))
+        db.session.commit()
+
+@pytest.mark.query_budget(2)
+def test_list_service_requests_loads_clients_once(app, client):
+    seed(app)
+    response = client.get('/api/service-requests')
+    assert response.status_code == 200
+    assert len(response.get_json()) == CLIENTS
+    assert all(sr['clientName'] != 'Unknown' for sr in response.get_json())
+
+@pytest.mark.query_budget(3)
+def test_list_service_requests_with_archive(app, client):
+    seed(app)
+    response = client.get('/api/service-requests?include_archived=true')
+    assert response.status_code == 200
+    assert len(response.get_json()) == 2 * CLIENTS
@@ -45,18 +45,45 @@ window.addEventListener('unhandledrejection', function(event) {
     return false;
 });
 
-async function apiCall(endpoint, method = 'GET', data = null) {
+// Idempotency keys for create calls, one per form submission. A key is kept until
+// the server gives a final answer, so resubmitting the same form after a dropped
+// connection replays the first result instead of creating a duplicate. Editing the
+// form or clearing it starts a new submission with a new key.
+const pendingIdempotencyKeys = {};  // action -> { key, body }
+
+function idempotencyKeyFor(action, body) {
+    const pending = pendingIdempotencyKeys[action];
+    if (pending && pending.body === body) {
+        return pending.key;
+    }
+    const key = crypto.randomUUID();
+    pendingIdempotencyKeys[action] = { key: key, body: body };
+    return key;
+}
+
+function resetIdempotencyKey(action) {
+    delete pendingIdempotencyKeys[action];
+}
+
+async function apiCall(endpoint, method = 'GET', data = null, idempotencyAction = null) {
     try {
         const options = {
             method: method,
             headers: { 'Content-Type': 'application/json' }
         };
         if (data) options.body = JSON.stringify(data);
+        if (idempotencyAction) options.headers['Idempotency-Key'] = idempotencyKeyFor(idempotencyAction, options.body);
         
         console.log(`[API] ${method} ${endpoint}`);
         const response = await fetch(`${API_URL}${endpoint}`, options);
         const result = await response.json();
         
+        // Keep the key on 409 (first attempt still running), 5xx and unreadable
+        // bodies so a retry of this submission can't create a second record
+        if (idempotencyAction && response.status < 500 && response.status !== 409) {
+            resetIdempotencyKey(idempotencyAction);
+        }
+        
         if (!response.ok) {
             throw new Error(result.error || `HTTP ${response.status}`);
         }
@@ -200,7 +227,6 @@ async function loadClientProfiles(searchTerm = '') {
     try {
         console.log('[LOAD CLIENT PROFILES]');
         const profiles = await apiCall('/clients', 'GET');
-        const allServiceRequests = await apiCall('/service-requests', 'GET');
         const container = document.getElementById('clientProfilesContainer');
         
         if (profiles.length === 0) {
@@ -230,8 +256,7 @@ async function loadClientProfiles(searchTerm = '') {
         filteredProfiles.forEach(p => {
             const fullName = p.CustomerFirstName + ' ' + p.CustomerLastName;
             const clientId = p.clientIdNumber || 'N/A';
-            const clientRequests = allServiceRequests.filter(sr => sr.clientId === p.id);
-            const requestCount = clientRequests.length;
+            const requestCount = p.requestCount || 0;
             const canEdit = userCan('edit_any_client') || (userCan('edit_own_client') && p.createdBy === currentUser.username);
             
             html += `<tr style="cursor: pointer;" onclick="expandClientDetails(${p.id}, '${fullName}', '${clientId}')">
@@ -261,8 +286,15 @@ function searchClientProfiles() {
     loadClientProfiles(searchTerm);
 }
 
-function expandClientDetails(clientId, clientName, clientIdNumber) {
-    const clientRequests = allServiceRequests.filter(sr => sr.clientId === clientId);
+async function expandClientDetails(clientId, clientName, clientIdNumber) {
+    // Same source as the count badge, archived jobs included
+    let clientRequests = [];
+    try {
+        clientRequests = await apiCall(`/service-requests/client/${clientId}?include_archived=true`, 'GET');
+    } catch (error) {
+        console.error('[EXPAND CLIENT DETAILS ERROR]', error);
+        return;
+    }
     
     let detailsHtml = `
         <div style="border: 2px solid #4169E1; padding: 15px; margin-top: 15px; border-radius: 5px; background-color: #f9f9f9;">
@@ -316,9 +348,10 @@ async function createClientProfile() {
             customer_phone: customerPhone,
             created_by: currentUser.username,
             created_by_name: currentUser.name
-        });
+        }, 'create-client');
         
         // Clear form
+        resetIdempotencyKey('create-client');
         document.getElementById('newCustomerFirstName').value = '';
         document.getElementById('newCustomerLastName').value = '';
         document.getElementById('newCustomerPhone').value = '';
@@ -738,11 +771,15 @@ function clearSelectedClient() {
 // Service Requests Functions
 
 let allServiceRequests = [];
+let serviceEmployees = [];  // Loaded with the service requests, used to resolve assignee names
 
 async function loadServiceRequests() {
     try {
         console.log('[LOAD SERVICE REQUESTS]');
-        allServiceRequests = await apiCall('/service-requests', 'GET');
+        // One round trip for the list and the employees the form needs
+        const data = await apiCall('/bootstrap?include=serviceRequests,users', 'GET');
+        allServiceRequests = data.serviceRequests;
+        serviceEmployees = data.users;
         displayServiceRequests(allServiceRequests);
         setupClientTypeToggle();  // CORRECT - in try block!
         console.log('[LOAD SERVICE REQUESTS] Complete');
@@ -867,10 +904,14 @@ async function createServiceRequest() {
                     customer_last_name: lastName,
                     customer_phone: phone,
                     created_by: currentUser.username,
-                    created_by_name: currentUser.name
-                });
+                    created_by_name: currentUser.name,
+                    reuse_existing: true
+                }, 'create-service-request-client');
                 
                 clientId = clientResponse.client.id;
+                if (clientResponse.duplicate) {
+                    showAlert(`Using existing client ${clientResponse.client.clientIdNumber}`, 'success');
+                }
                 console.log('[CREATE SERVICE REQUEST] New client created:', clientId);
             } catch (error) {
                 showAlert('Error creating new client: ' + error.message, 'danger');
@@ -909,7 +950,7 @@ async function createServiceRequest() {
             // Get assigned employee name if assigned
             let assignedToName = null;
             if (assignedTo) {
-                const employees = await apiCall('/auth/users', 'GET');
+                const employees = serviceEmployees.length ? serviceEmployees : await apiCall('/auth/users', 'GET');
                 const emp = employees.find(e => e.username === assignedTo);
                 assignedToName = emp ? emp.name : null;
             }
@@ -935,9 +976,11 @@ async function createServiceRequest() {
                 cost: cost,
                 created_by: currentUser.username,
                 created_by_name: currentUser.name
-            });
+            }, 'create-service-request');
             
             // Clear form
+            resetIdempotencyKey('create-service-request-client');
+            resetIdempotencyKey('create-service-request');
             document.querySelector('input[name="clientType"][value="existing"]').checked = true;
             handleClientTypeChange(); // Reset toggle
             document.getElementById('clientSearchBox').value = '';
@@ -974,7 +1017,7 @@ async function createServiceRequest() {
 
 async function openViewServiceRequestModal(id) {
     try {
-        const req = await apiCall(`/service-requests/${id}`, 'GET');
+        const req = await apiCall(`/service-requests/${id}?include_archived=true`, 'GET');
         const srNumber = req.serviceRequestNumber || `SR${req.id}`;
         
         let html = `
@@ -1049,11 +1092,13 @@ async function openViewServiceRequestModal(id) {
 
 async function openEditServiceRequestModal(id) {
     try {
-        // Get the request data
-        const req = await apiCall(`/service-requests/${id}`, 'GET');
+        // Get the request data, clients and employees in one round trip
+        const data = await apiCall(`/bootstrap?include=clients,users&service_request_id=${id}` +
+            '&fields[clients]=id,CustomerFirstName,CustomerLastName&fields[users]=username,name,role', 'GET');
+        const req = data.serviceRequest;
         
         // Populate client dropdown
-        const clients = await apiCall('/clients', 'GET');
+        const clients = data.clients;
         const clientDropdown = document.getElementById('editServiceClientId');
         clientDropdown.innerHTML = '<option value="">Select a client...</option>';
         clients.forEach(client => {
@@ -1064,7 +1109,8 @@ async function openEditServiceRequestModal(id) {
         });
         
         // Populate employee dropdown
-        const employees = await apiCall('/auth/users', 'GET');
+        const employees = data.users;
+        serviceEmployees = employees;
         const empDropdown = document.getElementById('editServiceAssignedTo');
         empDropdown.innerHTML = '<option value="">Unassigned</option>';
         employees.forEach(emp => {
@@ -1141,7 +1187,7 @@ async function saveServiceRequest() {
     try {
         let assignedToName = null;
         if (assignedTo) {
-            const employees = await apiCall('/auth/users', 'GET');
+            const employees = serviceEmployees.length ? serviceEmployees : await apiCall('/auth/users', 'GET');
             const emp = employees.find(e => e.username === assignedTo);
             assignedToName = emp ? emp.name : null;
         }